@@ -0,0 +1,32 @@
+from utils.db import connect
+from utils.adherence import run_adherence
+import sys
+
+
+def main():
+    # Nightly job: compares PlanExercises targets with logged SetLogs for
+    # plan-tagged TrainingSessions and updates the PlanAdherence* summary tables.
+    # Only weeks with new sessions are recomputed; pass --full to rescore all
+    # history (needed after editing or back-filling older sessions).
+    full = "--full" in sys.argv[1:]
+    try:
+        # Separate connections so committing the written batches never
+        # disturbs the cursors still streaming the source rows.
+        conn = connect()
+        write_conn = connect()
+
+        print("Computing plan adherence" + (" (full rebuild)..." if full else "..."))
+        session_count, weekly_count = run_adherence(conn, write_conn, full=full)
+
+        write_conn.close()
+        conn.close()
+        print(
+            f"OK: {session_count} session and {weekly_count} weekly adherence rows written"
+        )
+    except Exception as e:
+        print(f"ERROR computing plan adherence: {e}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
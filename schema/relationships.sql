@@ -24,6 +24,10 @@ ALTER TABLE TrainingSessions
 ADD CONSTRAINT FK_Sessions_Members
 FOREIGN KEY (MemberID) REFERENCES Members(MemberID);
 
+ALTER TABLE TrainingSessions
+ADD CONSTRAINT FK_Sessions_WorkoutPlans
+FOREIGN KEY (PlanTemplateID) REFERENCES WorkoutPlans(PlanTemplateID);
+
 ALTER TABLE SessionExercises
 ADD CONSTRAINT FK_SessionExercises_Sessions
 FOREIGN KEY (SessionID) REFERENCES TrainingSessions(SessionID);
@@ -72,6 +72,8 @@ CREATE TABLE TrainingSessions (
     SessionDateTime DATETIME,
     DurationMinutes INTEGER,
     SessionType TEXT(30),
+    PlanTemplateID LONG,
+    DayNumber INTEGER,
     Notes TEXT(255)
 );
 
@@ -122,3 +124,62 @@ CREATE TABLE Recommendations (
     ReasonText TEXT(255),
     RelatedExerciseID LONG
 );
+
+-- Indexes for the plan adherence bulk queries: they read sessions in
+-- (MemberID, SessionDateTime, SessionID) order and look up plan targets by plan day.
+CREATE INDEX IX_TrainingSessions_MemberDate ON TrainingSessions (MemberID, SessionDateTime, SessionID);
+
+CREATE INDEX IX_PlanExercises_PlanDay ON PlanExercises (PlanTemplateID, DayNumber);
+
+CREATE INDEX IX_SessionExercises_Session ON SessionExercises (SessionID, ExerciseID);
+
+CREATE INDEX IX_SetLogs_SessionExercise ON SetLogs (SessionExerciseID, SetNumber);
+
+-- Plan Adherence (kept up to date nightly by adherence.py)
+-- No foreign keys: these rows are derived, and would otherwise block deleting
+-- a member or session until the next rebuild.
+-- Natural primary keys instead of AUTOINCREMENT: rows are deleted and re-inserted
+-- on every run, and a counter would keep climbing towards the LONG limit.
+CREATE TABLE PlanAdherenceSessions (
+    SessionID LONG NOT NULL PRIMARY KEY,
+    MemberID LONG NOT NULL,
+    SessionDateTime DATETIME,
+    PlanTemplateID LONG,
+    DayNumber INTEGER,
+    TargetSets INTEGER,
+    SetsCompleted INTEGER,
+    SetsInRepRange INTEGER,
+    AvgRPEDeviation DOUBLE,
+    RPEScore DOUBLE,
+    AdherenceScore DOUBLE
+);
+
+CREATE INDEX IX_PlanAdherenceSessions_MemberDate ON PlanAdherenceSessions (MemberID, SessionDateTime);
+
+CREATE TABLE PlanAdherenceWeekly (
+    MemberID LONG NOT NULL,
+    WeekStart DATETIME NOT NULL,
+    SessionCount INTEGER,
+    TargetSets INTEGER,
+    SetsCompleted INTEGER,
+    SetsInRepRange INTEGER,
+    AvgRPEDeviation DOUBLE,
+    RPEScore DOUBLE,
+    AdherenceScore DOUBLE,
+    CONSTRAINT PK_PlanAdherenceWeekly PRIMARY KEY (MemberID, WeekStart)
+);
+
+-- Weeks (Monday start) waiting to be recomputed by the next incremental run
+CREATE TABLE PlanAdherenceDirtyWeeks (
+    MemberID LONG NOT NULL,
+    WeekStart DATETIME NOT NULL,
+    CONSTRAINT PK_PlanAdherenceDirtyWeeks PRIMARY KEY (MemberID, WeekStart)
+);
+
+-- One row per completed run; MAX(LastSessionID) is the incremental watermark
+CREATE TABLE PlanAdherenceRuns (
+    RunID AUTOINCREMENT PRIMARY KEY,
+    RunOn DATETIME,
+    LastSessionID LONG,
+    FullRebuild YESNO
+);
@@ -0,0 +1,155 @@
+import os
+import sys
+from collections import namedtuple
+from datetime import datetime
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from utils.adherence import (  # noqa: E402
+    dirty_weeks,
+    member_chunks,
+    merge_join,
+    session_adherence,
+    weekly_adherence,
+)
+
+# Row shapes match PLAN_TARGETS_SQL / PERFORMED_SETS_SQL (pyodbc rows allow attribute access).
+Target = namedtuple(
+    "Target",
+    "MemberID SessionDateTime SessionID ExerciseID PlanTemplateID DayNumber SortOrder "
+    "TargetSets TargetRepsMin TargetRepsMax TargetRPE",
+)
+Set = namedtuple(
+    "Set", "MemberID SessionDateTime SessionID ExerciseID SetNumber Reps RPE"
+)
+
+MON = datetime(2024, 1, 15, 18, 0)
+WED = datetime(2024, 1, 17, 18, 0)
+NEXT_MON = datetime(2024, 1, 22, 18, 0)
+
+
+def target(session_id, exercise_id, sets, reps=(8, 12), rpe=7.0, when=MON, sort_order=1):
+    return Target(1, when, session_id, exercise_id, 1, 1, sort_order, sets, reps[0], reps[1], rpe)
+
+
+def logged(session_id, exercise_id, set_number, reps, rpe=7.0, when=MON):
+    return Set(1, when, session_id, exercise_id, set_number, reps, rpe)
+
+
+def sessions_by_id(targets, performed):
+    return {row.SessionID: row for row, _ in session_adherence(iter(targets), iter(performed))}
+
+
+def test_skipped_exercise_counts_planned_sets_only():
+    targets = [target(1, 1, 2), target(1, 2, 2)]
+    performed = [logged(1, 1, 1, 10), logged(1, 1, 2, 10)]
+
+    joined = list(merge_join(iter(targets), iter(performed)))
+    assert [len(sets) for _, sets in joined] == [2, 0]
+
+    row = sessions_by_id(targets, performed)[1]
+    # TargetSets, SetsCompleted, SetsInRepRange, AvgRPEDeviation, AdherenceScore
+    # Skipped sets only lower completion; both logged sets were in range.
+    assert row[5:] == (4, 2, 2, 0.0, 1.0, round((0.5 + 1.0) / 2, 4))
+
+
+def test_unplanned_exercise_is_dropped():
+    targets = [target(1, 2, 1)]
+    performed = [logged(1, 1, 1, 10), logged(1, 2, 1, 10), logged(1, 3, 1, 10)]
+
+    joined = list(merge_join(iter(targets), iter(performed)))
+    assert len(joined) == 1
+    assert [s.ExerciseID for s in joined[0][1]] == [2]
+
+
+def test_exercise_logged_twice_extra_sets_dropped():
+    # Two SessionExercises rows for the same exercise: all five sets share the join key.
+    targets = [target(1, 1, 3)]
+    performed = [logged(1, 1, n, 10) for n in (1, 2, 3)] + [
+        logged(1, 1, n, 20, rpe=10.0) for n in (1, 2)
+    ]
+
+    row = sessions_by_id(targets, performed)[1]
+    assert row[5:] == (3, 3, 3, 0.0, 1.0, 1.0)
+
+
+def test_repeated_prescription_consumes_sets_in_order():
+    # Same exercise twice on one day: 2 heavy sets (3-5 reps) then 2 light sets (10-15 reps).
+    targets = [
+        target(1, 1, 2, reps=(3, 5), rpe=9.0, sort_order=1),
+        target(1, 1, 2, reps=(10, 15), rpe=6.0, sort_order=2),
+    ]
+    performed = [
+        logged(1, 1, 1, 5, rpe=9.0),
+        logged(1, 1, 2, 4, rpe=9.0),
+        logged(1, 1, 3, 12, rpe=6.0),
+        logged(1, 1, 4, 4, rpe=8.0),
+    ]
+
+    row = sessions_by_id(targets, performed)[1]
+    # Set 4 is judged against the second prescription: reps out of range, RPE off by 2.
+    assert row[5:8] == (4, 4, 3)
+    assert row.AvgRPEDeviation == 0.5
+    assert row.AdherenceScore == round((1.0 + 0.75) / 2, 4)
+
+
+def test_missing_rpe_does_not_change_adherence_score():
+    targets = [target(1, 1, 2), target(2, 1, 2)]
+    performed = [
+        logged(1, 1, 1, 10, rpe=9.5),
+        logged(1, 1, 2, 10, rpe=9.5),
+        logged(2, 1, 1, 10, rpe=None),
+        logged(2, 1, 2, 10, rpe=None),
+    ]
+
+    rows = sessions_by_id(targets, performed)
+    assert rows[1].AdherenceScore == rows[2].AdherenceScore == 1.0
+    assert rows[1].RPEScore == round(1 - 2.5 / 3.0, 4)
+    assert rows[2].RPEScore is None
+    assert rows[2].AvgRPEDeviation is None
+
+
+def test_sessions_at_same_timestamp_are_kept_apart():
+    targets = [target(1, 1, 2), target(2, 1, 2)]
+    performed = [logged(1, 1, 1, 10), logged(1, 1, 2, 10), logged(2, 1, 1, 10)]
+
+    rows = sessions_by_id(targets, performed)
+    assert rows[1].SetsCompleted == 2
+    assert rows[2].SetsCompleted == 1
+
+
+def test_weekly_rollup_splits_on_monday():
+    targets = [
+        target(1, 1, 2, when=MON),
+        target(2, 1, 2, when=WED),
+        target(3, 1, 2, when=NEXT_MON),
+    ]
+    performed = [
+        logged(1, 1, 1, 10, when=MON),
+        logged(1, 1, 2, 10, when=MON),
+        logged(2, 1, 1, 10, when=WED),
+        logged(3, 1, 1, 10, when=NEXT_MON),
+    ]
+
+    sessions = session_adherence(iter(targets), iter(performed))
+    weeks = list(weekly_adherence(sessions))
+    # MemberID, WeekStart, SessionCount, TargetSets, SetsCompleted
+    assert [w[:5] for w in weeks] == [
+        (1, datetime(2024, 1, 15), 2, 4, 3),
+        (1, datetime(2024, 1, 22), 1, 2, 1),
+    ]
+
+
+def test_dirty_weeks_are_monday_keys_per_member():
+    rows = [(1, MON), (1, WED), (1, NEXT_MON), (2, WED)]
+    assert dirty_weeks(rows) == {
+        (1, datetime(2024, 1, 15)),
+        (1, datetime(2024, 1, 22)),
+        (2, datetime(2024, 1, 15)),
+    }
+
+
+def test_member_chunks_never_split_a_member():
+    counts = [(1, 3), (2, 3), (5, 4), (7, 12), (9, 1)]
+    assert member_chunks(counts, 6) == [(1, 2), (5, 5), (7, 7), (9, 9)]
+    assert member_chunks([], 6) == []
@@ -0,0 +1,437 @@
+import itertools
+from collections import namedtuple
+from datetime import datetime, timedelta
+
+# Rows are streamed from the database and written back in batches of this size,
+# so memory stays flat no matter how many members are processed.
+BATCH_SIZE = 5000
+
+# Each commit covers at most this many dirty (MemberID, WeekStart) keys. Deleting and
+# re-inserting their session and weekly rows must stay well below Jet's default
+# MaxLocksPerFile (9,500), or the transaction fails with error 3052.
+DIRTY_WEEKS_PER_COMMIT = 500
+
+# An average RPE miss of this many points (or more) gives an RPEScore of 0.
+RPE_DEVIATION_SCALE = 3.0
+
+# Sessions to score. A full run reads every plan-tagged session; an incremental run
+# only reads sessions falling into a week listed in PlanAdherenceDirtyWeeks.
+# Both are capped at the SessionID watermark taken at the start of the run.
+# NOTE: Access needs the extra parentheses around multi-table joins and ON clauses.
+ALL_SESSIONS_SQL = "TrainingSessions ts"
+
+DIRTY_SESSIONS_SQL = """(TrainingSessions ts
+INNER JOIN PlanAdherenceDirtyWeeks dw
+    ON (ts.MemberID = dw.MemberID
+        AND ts.SessionDateTime >= dw.WeekStart
+        AND ts.SessionDateTime < DateAdd('d', 7, dw.WeekStart)))"""
+
+# Both streams are sorted on the same key, (MemberID, SessionDateTime, SessionID, ExerciseID),
+# so they can be combined with a single sort-merge pass instead of per-member queries.
+# SessionID only breaks ties between two sessions logged at the same time.
+PLAN_TARGETS_SQL = """
+SELECT ts.MemberID, ts.SessionDateTime, ts.SessionID, pe.ExerciseID,
+    ts.PlanTemplateID, ts.DayNumber, pe.SortOrder,
+    pe.TargetSets, pe.TargetRepsMin, pe.TargetRepsMax, pe.TargetRPE
+FROM {sessions}
+INNER JOIN PlanExercises pe
+    ON (ts.PlanTemplateID = pe.PlanTemplateID AND ts.DayNumber = pe.DayNumber)
+WHERE ts.SessionDateTime IS NOT NULL AND ts.SessionID <= ?
+ORDER BY ts.MemberID, ts.SessionDateTime, ts.SessionID, pe.ExerciseID, pe.SortOrder
+"""
+
+PERFORMED_SETS_SQL = """
+SELECT ts.MemberID, ts.SessionDateTime, ts.SessionID, se.ExerciseID,
+    sl.SetNumber, sl.Reps, sl.RPE
+FROM ({sessions}
+INNER JOIN SessionExercises se ON ts.SessionID = se.SessionID)
+INNER JOIN SetLogs sl ON se.SessionExerciseID = sl.SessionExerciseID
+WHERE ts.PlanTemplateID IS NOT NULL AND ts.SessionDateTime IS NOT NULL AND ts.SessionID <= ?
+ORDER BY ts.MemberID, ts.SessionDateTime, ts.SessionID, se.ExerciseID, se.SortOrder, sl.SetNumber
+"""
+
+# Per-member row counts used to split the work into commits.
+PLANNED_SESSION_COUNTS_SQL = """
+SELECT MemberID, COUNT(*) FROM TrainingSessions
+WHERE PlanTemplateID IS NOT NULL AND SessionDateTime IS NOT NULL AND SessionID <= ?
+GROUP BY MemberID ORDER BY MemberID
+"""
+
+DIRTY_WEEK_COUNTS_SQL = """
+SELECT MemberID, COUNT(*) FROM PlanAdherenceDirtyWeeks
+GROUP BY MemberID ORDER BY MemberID
+"""
+
+NEW_SESSIONS_SQL = """
+SELECT MemberID, SessionDateTime FROM TrainingSessions
+WHERE SessionID > ? AND SessionID <= ?
+    AND PlanTemplateID IS NOT NULL AND SessionDateTime IS NOT NULL
+"""
+
+DELETE_DIRTY_SESSIONS_SQL = """
+DELETE FROM PlanAdherenceSessions
+WHERE MemberID BETWEEN ? AND ? AND EXISTS (
+    SELECT * FROM PlanAdherenceDirtyWeeks dw
+    WHERE dw.MemberID = PlanAdherenceSessions.MemberID
+        AND PlanAdherenceSessions.SessionDateTime >= dw.WeekStart
+        AND PlanAdherenceSessions.SessionDateTime < DateAdd('d', 7, dw.WeekStart))
+"""
+
+DELETE_DIRTY_WEEKS_SQL = """
+DELETE FROM PlanAdherenceWeekly
+WHERE MemberID BETWEEN ? AND ? AND EXISTS (
+    SELECT * FROM PlanAdherenceDirtyWeeks dw
+    WHERE dw.MemberID = PlanAdherenceWeekly.MemberID
+        AND dw.WeekStart = PlanAdherenceWeekly.WeekStart)
+"""
+
+SESSION_INSERT_SQL = "INSERT INTO PlanAdherenceSessions (MemberID, SessionID, SessionDateTime, PlanTemplateID, DayNumber, TargetSets, SetsCompleted, SetsInRepRange, AvgRPEDeviation, RPEScore, AdherenceScore) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)"
+
+WEEKLY_INSERT_SQL = "INSERT INTO PlanAdherenceWeekly (MemberID, WeekStart, SessionCount, TargetSets, SetsCompleted, SetsInRepRange, AvgRPEDeviation, RPEScore, AdherenceScore) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)"
+
+DIRTY_WEEK_INSERT_SQL = "INSERT INTO PlanAdherenceDirtyWeeks (MemberID, WeekStart) VALUES (?, ?)"
+
+RUN_INSERT_SQL = "INSERT INTO PlanAdherenceRuns (RunOn, LastSessionID, FullRebuild) VALUES (?, ?, ?)"
+
+# Result rows, in the column order of the INSERT statements above.
+SessionAdherence = namedtuple(
+    "SessionAdherence",
+    "MemberID SessionID SessionDateTime PlanTemplateID DayNumber "
+    "TargetSets SetsCompleted SetsInRepRange AvgRPEDeviation RPEScore AdherenceScore",
+)
+
+WeeklyAdherence = namedtuple(
+    "WeeklyAdherence",
+    "MemberID WeekStart SessionCount "
+    "TargetSets SetsCompleted SetsInRepRange AvgRPEDeviation RPEScore AdherenceScore",
+)
+
+
+def _join_key(row):
+    return (row.MemberID, row.SessionDateTime, row.SessionID, row.ExerciseID)
+
+
+def _session_key(row):
+    return (row.MemberID, row.SessionDateTime, row.SessionID)
+
+
+def _joined_session_key(pair):
+    # pair is a (target_rows, set_rows) group from merge_join
+    return _session_key(pair[0][0])
+
+
+def _weekly_key(pair):
+    # pair is a (SessionAdherence, totals) result from session_adherence
+    row = pair[0]
+    return (row.MemberID, _week_start(row.SessionDateTime))
+
+
+def _week_start(dt):
+    """Monday 00:00 of the week containing dt."""
+    day = datetime(dt.year, dt.month, dt.day)
+    return day - timedelta(days=day.weekday())
+
+
+def fetch_rows(conn, sql, params=()):
+    """Stream rows of a query in batches instead of loading the full result."""
+    cursor = conn.cursor()
+    cursor.execute(sql, params)
+    while True:
+        rows = cursor.fetchmany(BATCH_SIZE)
+        if not rows:
+            break
+        yield from rows
+
+
+def merge_join(targets, performed):
+    """
+    Sort-merge join of plan targets and performed sets on the join key.
+    Both inputs must already be sorted by that key (the SQL above does this).
+    Yields (target_rows, set_rows) for every planned exercise of every session;
+    set_rows is empty when the exercise was skipped. Performed exercises that
+    are not part of the plan are dropped.
+    """
+    performed_groups = itertools.groupby(performed, key=_join_key)
+    perf_key, perf_rows = next(performed_groups, (None, None))
+    for key, target_rows in itertools.groupby(targets, key=_join_key):
+        while perf_key is not None and perf_key < key:
+            perf_key, perf_rows = next(performed_groups, (None, None))
+        sets = list(perf_rows) if perf_key == key else []
+        yield list(target_rows), sets
+
+
+def _new_totals():
+    return {
+        "target_sets": 0,
+        "completed": 0,
+        "in_range": 0,
+        "rpe_dev_sum": 0.0,
+        "rpe_dev_count": 0,
+    }
+
+
+def _add_totals(acc, other):
+    for k in acc:
+        acc[k] += other[k]
+
+
+def score_exercise(target_rows, set_rows):
+    """
+    Compare one planned exercise with the sets actually logged for it.
+    If the plan lists the exercise more than once on the same day, the logged
+    sets are consumed in order: the first TargetSets sets count against the
+    first prescription, the next ones against the second, and so on.
+    Sets beyond the planned total are ignored.
+    """
+    totals = _new_totals()
+    remaining = iter(set_rows)
+    for target in target_rows:
+        n = target.TargetSets or 0
+        totals["target_sets"] += n
+        for s in itertools.islice(remaining, n):
+            totals["completed"] += 1
+            if s.Reps is not None:
+                lo, hi = target.TargetRepsMin, target.TargetRepsMax
+                if (lo is None or s.Reps >= lo) and (hi is None or s.Reps <= hi):
+                    totals["in_range"] += 1
+            if s.RPE is not None and target.TargetRPE is not None:
+                totals["rpe_dev_sum"] += abs(s.RPE - target.TargetRPE)
+                totals["rpe_dev_count"] += 1
+    return totals
+
+
+def adherence_score(totals):
+    """
+    Returns (avg_rpe_deviation, rpe_score, adherence_score), rounded to 4 decimals.
+    AdherenceScore (0..1) is the mean of set completion (completed / target sets)
+    and the reps-in-range ratio (in range / completed sets, 0 when nothing was
+    logged); it is None when nothing was planned. RPE is scored separately in
+    RPEScore (1 at TargetRPE, dropping linearly to 0 at RPE_DEVIATION_SCALE) and
+    is None when no RPE was logged, so members who don't log RPE are scored on
+    the same inputs as everyone else.
+    """
+    avg_dev = None
+    rpe_score = None
+    if totals["rpe_dev_count"]:
+        avg_dev = totals["rpe_dev_sum"] / totals["rpe_dev_count"]
+        rpe_score = round(max(0.0, 1 - avg_dev / RPE_DEVIATION_SCALE), 4)
+        avg_dev = round(avg_dev, 4)
+    if not totals["target_sets"]:
+        return avg_dev, rpe_score, None
+
+    completed = totals["completed"]
+    completion = completed / totals["target_sets"]
+    reps_ratio = totals["in_range"] / completed if completed else 0.0
+    return avg_dev, rpe_score, round((completion + reps_ratio) / 2, 4)
+
+
+def session_adherence(targets, performed):
+    """
+    Roll the merge-joined exercises up to sessions, for all members in one pass.
+    Yields (SessionAdherence, totals) in (MemberID, SessionDateTime) order.
+    """
+    joined = merge_join(targets, performed)
+    for _, exercises in itertools.groupby(joined, key=_joined_session_key):
+        totals = _new_totals()
+        first = None
+        for target_rows, set_rows in exercises:
+            if first is None:
+                first = target_rows[0]
+            _add_totals(totals, score_exercise(target_rows, set_rows))
+        avg_dev, rpe_score, score = adherence_score(totals)
+        row = SessionAdherence(
+            first.MemberID,
+            first.SessionID,
+            first.SessionDateTime,
+            first.PlanTemplateID,
+            first.DayNumber,
+            totals["target_sets"],
+            totals["completed"],
+            totals["in_range"],
+            avg_dev,
+            rpe_score,
+            score,
+        )
+        yield row, totals
+
+
+def weekly_adherence(sessions):
+    """
+    Roll session results up to (MemberID, WeekStart). Sessions arrive sorted by
+    member and date, so each week is contiguous in the stream.
+    Yields WeeklyAdherence rows.
+    """
+    for (member_id, week_start), items in itertools.groupby(sessions, key=_weekly_key):
+        totals = _new_totals()
+        session_count = 0
+        for _, session_totals in items:
+            session_count += 1
+            _add_totals(totals, session_totals)
+        avg_dev, rpe_score, score = adherence_score(totals)
+        yield WeeklyAdherence(
+            member_id,
+            week_start,
+            session_count,
+            totals["target_sets"],
+            totals["completed"],
+            totals["in_range"],
+            avg_dev,
+            rpe_score,
+            score,
+        )
+
+
+def dirty_weeks(sessions):
+    """(MemberID, WeekStart) keys touched by (MemberID, SessionDateTime) rows."""
+    return {(member_id, _week_start(dt)) for member_id, dt in sessions}
+
+
+def member_chunks(counts, limit):
+    """
+    Pack (MemberID, row_count) pairs, sorted by MemberID, into (first, last)
+    MemberID ranges of at most limit rows each. A member is never split, so a
+    single member above the limit gets a range of its own.
+    """
+    chunks = []
+    first = last = None
+    total = 0
+    for member_id, count in counts:
+        if first is not None and total + count > limit:
+            chunks.append((first, last))
+            first, total = None, 0
+        if first is None:
+            first = member_id
+        last = member_id
+        total += count
+    if first is not None:
+        chunks.append((first, last))
+    return chunks
+
+
+def _executemany_committed(conn, sql, rows):
+    cursor = conn.cursor()
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= BATCH_SIZE:
+            cursor.executemany(sql, batch)
+            conn.commit()
+            batch.clear()
+    if batch:
+        cursor.executemany(sql, batch)
+        conn.commit()
+
+
+def _clear_table(conn, table):
+    """
+    Empty a table one member range at a time, committing after each range.
+    A single DELETE of the whole table would exceed Jet's MaxLocksPerFile.
+    """
+    cursor = conn.cursor()
+    cursor.execute(
+        f"SELECT MemberID, COUNT(*) FROM {table} GROUP BY MemberID ORDER BY MemberID"
+    )
+    for first, last in member_chunks(cursor.fetchall(), BATCH_SIZE):
+        cursor.execute(f"DELETE FROM {table} WHERE MemberID BETWEEN ? AND ?", [first, last])
+        conn.commit()
+
+
+def _last_session_watermark(conn):
+    cursor = conn.cursor()
+    cursor.execute("SELECT MAX(LastSessionID) FROM PlanAdherenceRuns")
+    return cursor.fetchone()[0]
+
+
+def _mark_dirty_weeks(conn, write_conn, watermark, high):
+    """
+    Add the weeks of sessions logged since the last run to PlanAdherenceDirtyWeeks.
+    Keys left over from an interrupted run are kept, so they get recomputed too.
+    """
+    cursor = conn.cursor()
+    cursor.execute("SELECT MemberID, WeekStart FROM PlanAdherenceDirtyWeeks")
+    existing = {(r.MemberID, r.WeekStart) for r in cursor.fetchall()}
+    new = dirty_weeks(fetch_rows(conn, NEW_SESSIONS_SQL, [watermark, high])) - existing
+    _executemany_committed(write_conn, DIRTY_WEEK_INSERT_SQL, sorted(new))
+
+
+def run_adherence(conn, write_conn, full=False):
+    """
+    Bring PlanAdherenceSessions and PlanAdherenceWeekly up to date.
+
+    Incremental runs (the default) only recompute the weeks of sessions logged
+    since the previous run, found through the SessionID watermark stored in
+    PlanAdherenceRuns. Each chunk of dirty weeks is deleted and re-inserted in
+    one transaction, so readers never see those weeks missing. Sets logged
+    later against an already scored session, or edited/deleted sessions, are
+    only picked up by a full run (full=True, also used when no run has been
+    recorded yet), which clears both tables and rescores all history.
+
+    Source rows are read through conn while results are written through
+    write_conn, so commits never disturb the cursors still streaming.
+    Returns (session_row_count, weekly_row_count).
+    """
+    cursor = conn.cursor()
+    cursor.execute("SELECT MAX(SessionID) FROM TrainingSessions")
+    high = cursor.fetchone()[0] or 0
+    watermark = _last_session_watermark(conn)
+    if watermark is None:
+        full = True
+
+    counts = {"sessions": 0, "weeks": 0}
+
+    autocommit = write_conn.autocommit
+    write_conn.autocommit = False
+    try:
+        write_cursor = write_conn.cursor()
+
+        if full:
+            # Forget the watermark first: if this run dies half way, the next
+            # run finds no watermark and does a full rebuild again.
+            write_cursor.execute("DELETE FROM PlanAdherenceRuns")
+            write_conn.commit()
+            _clear_table(write_conn, "PlanAdherenceSessions")
+            _clear_table(write_conn, "PlanAdherenceWeekly")
+            _clear_table(write_conn, "PlanAdherenceDirtyWeeks")
+            sessions_sql = ALL_SESSIONS_SQL
+            cursor.execute(PLANNED_SESSION_COUNTS_SQL, [high])
+            chunks = member_chunks(cursor.fetchall(), BATCH_SIZE)
+        else:
+            _mark_dirty_weeks(conn, write_conn, watermark, high)
+            sessions_sql = DIRTY_SESSIONS_SQL
+            cursor.execute(DIRTY_WEEK_COUNTS_SQL)
+            chunks = member_chunks(cursor.fetchall(), DIRTY_WEEKS_PER_COMMIT)
+
+        results = session_adherence(
+            fetch_rows(conn, PLAN_TARGETS_SQL.format(sessions=sessions_sql), [high]),
+            fetch_rows(conn, PERFORMED_SETS_SQL.format(sessions=sessions_sql), [high]),
+        )
+        pending = next(results, None)
+        for first, last in chunks:
+            if not full:
+                write_cursor.execute(DELETE_DIRTY_SESSIONS_SQL, [first, last])
+                write_cursor.execute(DELETE_DIRTY_WEEKS_SQL, [first, last])
+
+            chunk = []
+            while pending is not None and pending[0].MemberID <= last:
+                chunk.append(pending)
+                pending = next(results, None)
+            # The Access ODBC driver has no parameter arrays, so executemany
+            # still sends one INSERT per row; chunks keep that to the day's changes.
+            if chunk:
+                write_cursor.executemany(SESSION_INSERT_SQL, [row for row, _ in chunk])
+                weeks = list(weekly_adherence(iter(chunk)))
+                write_cursor.executemany(WEEKLY_INSERT_SQL, weeks)
+                counts["sessions"] += len(chunk)
+                counts["weeks"] += len(weeks)
+            write_conn.commit()
+
+        if not full:
+            _clear_table(write_conn, "PlanAdherenceDirtyWeeks")
+        write_cursor.execute(RUN_INSERT_SQL, [datetime.now(), high, full])
+        write_conn.commit()
+    except Exception:
+        write_conn.rollback()
+        raise
+    finally:
+        write_conn.autocommit = autocommit
+    return counts["sessions"], counts["weeks"]
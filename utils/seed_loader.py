@@ -288,13 +288,21 @@ def load_seed_data(conn):
             try:
                 member_idx = int(row["MemberID"]) - 1
                 if 0 <= member_idx < len(member_list):
+                    # PlanTemplateID/DayNumber are blank for sessions that don't follow a plan
+                    plan_template_id = None
+                    if row.get("PlanTemplateID"):
+                        plan_idx = int(row["PlanTemplateID"]) - 1
+                        if 0 <= plan_idx < len(workout_plan_list):
+                            plan_template_id = workout_plan_list[plan_idx]
                     cursor.execute(
-                        "INSERT INTO TrainingSessions (MemberID, SessionDateTime, DurationMinutes, SessionType, Notes) VALUES (?, ?, ?, ?, ?)",
+                        "INSERT INTO TrainingSessions (MemberID, SessionDateTime, DurationMinutes, SessionType, PlanTemplateID, DayNumber, Notes) VALUES (?, ?, ?, ?, ?, ?, ?)",
                         [
                             member_list[member_idx],
                             _to_datetime(row.get("SessionDateTime")),
                             _to_int(row.get("DurationMinutes")),
                             _blank_to_none(row.get("SessionType")),
+                            plan_template_id,
+                            _to_int(row.get("DayNumber")) if plan_template_id else None,
                             _blank_to_none(row.get("Notes")),
                         ],
                     )